@@ -11,7 +11,10 @@
 # ///
 # type: ignore
 import argparse
+import bisect
+import collections
 import functools
+import itertools
 import json
 import pathlib
 import re
@@ -44,10 +47,15 @@ ansi_fe_escape_re = re.compile(
 
 def strip_ansi(msg):
     """strip all ansi escape sequences"""
+    # most messages don't contain any escape sequences, and searching for the ESC
+    # byte is much cheaper than running the regex
+    if "\x1b" not in msg:
+        return msg
+
     return ansi_fe_escape_re.sub("", msg)
 
 
-@dataclass
+@dataclass(slots=True)
 class SessionStart:
     pytest_version: str
     outcome: str = "status"
@@ -59,7 +67,7 @@ class SessionStart:
         return cls(**json_)
 
 
-@dataclass
+@dataclass(slots=True)
 class SessionFinish:
     exitstatus: str
     outcome: str = "status"
@@ -71,7 +79,7 @@ class SessionFinish:
         return cls(**json_)
 
 
-@dataclass
+@dataclass(slots=True)
 class PreformattedReport:
     filepath: str
     name: str
@@ -79,22 +87,29 @@ class PreformattedReport:
     message: str
 
     def __post_init__(self):
+        # reports of parametrized tests or tests in the same file share these
+        self.filepath = sys.intern(self.filepath)
+        if self.name is not None:
+            self.name = sys.intern(self.name)
+
         self.message = strip_ansi(self.message)
 
 
-@dataclass
+@dataclass(slots=True)
 class CollectionError:
     name: str
     repr_: str
 
 
+report_types = {
+    "TestReport": TestReport,
+    "CollectReport": CollectReport,
+    "SessionStart": SessionStart,
+    "SessionFinish": SessionFinish,
+}
+
+
 def parse_record(record):
-    report_types = {
-        "TestReport": TestReport,
-        "CollectReport": CollectReport,
-        "SessionStart": SessionStart,
-        "SessionFinish": SessionFinish,
-    }
     cls = report_types.get(record["$report_type"])
     if cls is None:
         raise ValueError(f"unknown report type: {record['$report_type']}")
@@ -102,25 +117,30 @@ def parse_record(record):
     return cls._from_json(record)
 
 
-nodeid_re = re.compile(r"(?P<filepath>.+?)::(?P<name>.+?)(?:\[(?P<variant>.+)\])?")
-
-
 def parse_nodeid(nodeid):
-    match = nodeid_re.fullmatch(nodeid)
-    if match is None:
+    # equivalent to fullmatching `(?P<filepath>.+?)::(?P<name>.+?)(?:\[(?P<variant>.+)\])?`,
+    # but string methods are a lot faster than the regex engine
+    separator = nodeid.find("::", 1)
+    if separator == -1 or separator + 2 == len(nodeid) or "\n" in nodeid:
         raise ValueError(f"unknown test id: {nodeid}")
 
-    return match.groupdict()
+    filepath = nodeid[:separator]
+    name = nodeid[separator + 2 :]
+    variant = None
 
+    bracket = name.find("[", 1)
+    if bracket != -1 and name.endswith("]") and bracket < len(name) - 2:
+        name, variant = name[:bracket], name[bracket + 1 : -1]
 
-@functools.singledispatch
-def preformat_report(report):
+    return {"filepath": filepath, "name": name, "variant": variant}
+
+
+def preformat_generic_report(report):
     parsed = parse_nodeid(report.nodeid)
     return PreformattedReport(message=str(report), **parsed)
 
 
-@preformat_report.register
-def _(report: TestReport):
+def preformat_test_report(report):
     parsed = parse_nodeid(report.nodeid)
     if isinstance(report.longrepr, str):
         message = report.longrepr
@@ -129,8 +149,7 @@ def _(report: TestReport):
     return PreformattedReport(message=message, **parsed)
 
 
-@preformat_report.register
-def _(report: CollectReport):
+def preformat_collect_report(report):
     if report.nodeid == "":
         return CollectionError(name=test_collection_stage, repr_=str(report.longrepr))
 
@@ -150,6 +169,19 @@ def _(report: CollectReport):
     return PreformattedReport(message=message, **parsed)
 
 
+preformatters = {
+    TestReport: preformat_test_report,
+    CollectReport: preformat_collect_report,
+}
+
+
+def preformat_report(report):
+    # a plain dict lookup is cheaper than `functools.singledispatch`, and the
+    # reports are never subclassed
+    preformatter = preformatters.get(type(report), preformat_generic_report)
+    return preformatter(report)
+
+
 def format_summary(report):
     if report.variant is not None:
         return f"{report.filepath}::{report.name}[{report.variant}]: {report.message}"
@@ -159,23 +191,46 @@ def format_summary(report):
         return f"{report.filepath}: {report.message}"
 
 
-def format_report(summaries, py_version):
-    template = textwrap.dedent(
-        """\
-        <details><summary>Python {py_version} Test Summary</summary>
+# can't use f-strings because the templates are formatted after dedenting
+report_template = textwrap.dedent(
+    """\
+    <details><summary>Python {py_version} Test Summary</summary>
+
+    ```
+    {summaries}
+    ```
+
+    </details>
+    """,
+)
+collection_error_template = textwrap.dedent(
+    """\
+    <details><summary>Python {py_version} Test Summary</summary>
+
+    {name} failed:
+    ```
+    {traceback}
+    ```
+
+    </details>
+    """,
+)
 
-        ```
-        {summaries}
-        ```
 
-        </details>
-        """,
+def format_report(summaries, py_version):
+    message = report_template.format(
+        summaries="\n".join(summaries), py_version=py_version
     )
-    # can't use f-strings because that would format *before* the dedenting
-    message = template.format(summaries="\n".join(summaries), py_version=py_version)
     return message
 
 
+def formatted_length(summaries, **formatter_kwargs):
+    """compute the length of the formatted report without formatting it"""
+    overhead = len(format_report([""], **formatter_kwargs))
+    n_newlines = max(len(summaries) - 1, 0)
+    return overhead + sum(len(summary) for summary in summaries) + n_newlines
+
+
 def merge_variants(reports, max_chars, **formatter_kwargs):
     def format_variant_group(name, group):
         filepath, test_name, message = name
@@ -189,28 +244,43 @@ def merge_variants(reports, max_chars, **formatter_kwargs):
         else:
             return f"{filepath}::{test_name}: {message}"
 
-    bucket = more_itertools.bucket(reports, lambda r: (r.filepath, r.name, r.message))
-
-    summaries = [format_variant_group(name, list(bucket[name])) for name in bucket]
-    formatted = format_report(summaries, **formatter_kwargs)
+    groups = collections.defaultdict(list)
+    for report in reports:
+        groups[(report.filepath, report.name, report.message)].append(report)
 
-    return formatted
+    summaries = [format_variant_group(name, group) for name, group in groups.items()]
+    if formatted_length(summaries, **formatter_kwargs) > max_chars:
+        return None
 
+    return format_report(summaries, **formatter_kwargs)
 
-def truncate(reports, max_chars, **formatter_kwargs):
-    fractions = [0.95, 0.75, 0.5, 0.25, 0.1, 0.01]
 
+def truncate(reports, max_chars, summaries=None, **formatter_kwargs):
     n_reports = len(reports)
-    for fraction in fractions:
-        n_selected = int(n_reports * fraction)
-        selected_reports = reports[: int(n_reports * fraction)]
-        report_messages = [format_summary(report) for report in selected_reports]
-        summary = report_messages + [f"+ {n_reports - n_selected} failing tests"]
-        formatted = format_report(summary, **formatter_kwargs)
-        if len(formatted) <= max_chars:
-            return formatted
+    if summaries is None:
+        summaries = [format_summary(report) for report in reports]
+
+    # length of the report without any summaries, and the length of the joined
+    # summaries (including the trailing newline) for each number of reports
+    overhead = len(format_report([""], **formatter_kwargs))
+    lengths = [0, *itertools.accumulate(len(summary) + 1 for summary in summaries)]
 
-    return None
+    def footer(n_selected):
+        return f"+ {n_reports - n_selected} failing tests"
+
+    def report_length(n_selected):
+        return overhead + lengths[n_selected] + len(footer(n_selected))
+
+    # the length grows monotonically with the number of selected reports, so we
+    # can bisect for the largest number of reports that still fits
+    n_selected = (
+        bisect.bisect_right(range(max(n_reports, 1)), max_chars, key=report_length) - 1
+    )
+    if n_selected < 0:
+        return None
+
+    summary = summaries[:n_selected] + [footer(n_selected)]
+    return format_report(summary, **formatter_kwargs)
 
 
 def summarize(reports, **formatter_kwargs):
@@ -219,16 +289,16 @@ def summarize(reports, **formatter_kwargs):
 
 
 def compressed_report(reports, max_chars, **formatter_kwargs):
+    summaries = [format_summary(report) for report in reports]
+    if formatted_length(summaries, **formatter_kwargs) <= max_chars:
+        return format_report(summaries, **formatter_kwargs)
+
     strategies = [
         merge_variants,
         # merge_test_files,
         # merge_tests,
-        truncate,
+        functools.partial(truncate, summaries=summaries),
     ]
-    summaries = [format_summary(report) for report in reports]
-    formatted = format_report(summaries, **formatter_kwargs)
-    if len(formatted) <= max_chars:
-        return formatted
 
     for strategy in strategies:
         formatted = strategy(reports, max_chars=max_chars, **formatter_kwargs)
@@ -239,25 +309,20 @@ def compressed_report(reports, max_chars, **formatter_kwargs):
 
 
 def format_collection_error(error, **formatter_kwargs):
-    return textwrap.dedent("""\
-        <details><summary>Python {py_version} Test Summary</summary>
-
-        {name} failed:
-        ```
-        {traceback}
-        ```
-
-        </details>
-        """).format(py_version=py_version, name=error.name, traceback=error.repr_)
+    return collection_error_template.format(
+        name=error.name, traceback=error.repr_, **formatter_kwargs
+    )
 
 
 def format_message(lines):
-    parsed_lines = [json.loads(line) for line in lines]
-    reports = [
+    # records of failed tests always contain the json string "failed", which allows
+    # skipping all other lines without decoding them (`json.loads` accepts bytes)
+    parsed_lines = (json.loads(line) for line in lines if b'"failed"' in line)
+    reports = (
         parse_record(data)
         for data in parsed_lines
         if data["$report_type"] != "WarningMessage"
-    ]
+    )
 
     failed = [report for report in reports if report.outcome == "failed"]
     preformatted = [preformat_report(report) for report in failed]
@@ -287,7 +352,8 @@ if __name__ == "__main__":
     path = args["log-file"]
 
     try:
-        lines = path.read_text().splitlines()
+        # report logs are commonly several MB, so read in larger chunks
+        f = path.open("rb", buffering=1024**2)
     except FileNotFoundError:
         message = textwrap.dedent(
             f"""\
@@ -303,7 +369,8 @@ if __name__ == "__main__":
             """,
         )
     else:
-        message = format_message(lines)
+        with f:
+            message = format_message(f)
 
     workflow_link = f"[Workflow Run URL]({args['workflow-url']})"
     body = "\n".join([workflow_link, "", message])
@@ -2,7 +2,7 @@ import re
 import sys
 
 import hypothesis.strategies as st
-from hypothesis import given, note
+from hypothesis import given, note, settings
 
 import format_issue_body
 
@@ -19,34 +19,26 @@ variants = st.from_regex(re.compile(r"(\w+-)*\w+"), fullmatch=True)
 messages = st.text()
 
 
-def ansi_csi_escapes():
-    parameter_bytes = st.lists(st.characters(min_codepoint=0x30, max_codepoint=0x3F))
-    intermediate_bytes = st.lists(st.characters(min_codepoint=0x20, max_codepoint=0x2F))
-    final_bytes = st.characters(min_codepoint=0x40, max_codepoint=0x7E)
+csi_parameter_bytes = st.lists(st.characters(min_codepoint=0x30, max_codepoint=0x3F))
+csi_intermediate_bytes = st.lists(st.characters(min_codepoint=0x20, max_codepoint=0x2F))
+csi_final_bytes = st.characters(min_codepoint=0x40, max_codepoint=0x7E)
+ansi_csi_escapes = st.builds(
+    lambda *args: "".join(["\x1b[", *args]),
+    csi_parameter_bytes.map("".join),
+    csi_intermediate_bytes.map("".join),
+    csi_final_bytes,
+)
 
-    return st.builds(
-        lambda *args: "".join(["\x1b[", *args]),
-        parameter_bytes.map("".join),
-        intermediate_bytes.map("".join),
-        final_bytes,
-    )
-
-
-def ansi_c1_escapes():
-    byte_ = st.characters(
-        codec="ascii", min_codepoint=0x40, max_codepoint=0x5F, exclude_characters=["["]
-    )
-    return st.builds(lambda b: f"\x1b{b}", byte_)
+c1_bytes = st.characters(
+    codec="ascii", min_codepoint=0x40, max_codepoint=0x5F, exclude_characters=["["]
+)
+ansi_c1_escapes = st.builds(lambda b: f"\x1b{b}", c1_bytes)
 
+ansi_fe_escapes = ansi_csi_escapes | ansi_c1_escapes
 
-def ansi_fe_escapes():
-    return ansi_csi_escapes() | ansi_c1_escapes()
-
-
-def preformatted_reports():
-    return st.tuples(filepaths, names, variants | st.none(), messages).map(
-        lambda x: format_issue_body.PreformattedReport(*x)
-    )
+preformatted_reports = st.tuples(filepaths, names, variants | st.none(), messages).map(
+    lambda x: format_issue_body.PreformattedReport(*x)
+)
 
 
 @given(filepaths, names, variants)
@@ -64,32 +56,93 @@ def test_parse_nodeid(path, name, variant):
     assert actual == expected
 
 
-@given(st.lists(preformatted_reports()), st.integers(min_value=0))
-def test_truncate(reports, max_chars):
+@given(st.lists(st.text()))
+def test_formatted_length(summaries):
+    py_version = ".".join(str(part) for part in sys.version_info[:3])
+
+    expected = len(format_issue_body.format_report(summaries, py_version=py_version))
+    actual = format_issue_body.formatted_length(summaries, py_version=py_version)
+
+    assert actual == expected
+
+
+@settings(max_examples=25)
+@given(
+    st.lists(preformatted_reports, max_size=20),
+    st.lists(st.integers(min_value=0), min_size=1, max_size=5),
+)
+def test_truncate(reports, max_chars_values):
+    py_version = ".".join(str(part) for part in sys.version_info[:3])
+
+    # drawing the reports is expensive, so check several limits for each list
+    for max_chars in max_chars_values:
+        formatted = format_issue_body.truncate(
+            reports, max_chars=max_chars, py_version=py_version
+        )
+
+        assert formatted is None or len(formatted) <= max_chars
+
+
+@given(
+    st.lists(preformatted_reports, max_size=20),
+    st.integers(min_value=0, max_value=2000),
+)
+def test_truncate_largest(reports, max_chars):
     py_version = ".".join(str(part) for part in sys.version_info[:3])
 
+    summaries = [format_issue_body.format_summary(report) for report in reports]
+    candidates = [
+        format_issue_body.format_report(
+            summaries[:n] + [f"+ {len(reports) - n} failing tests"],
+            py_version=py_version,
+        )
+        for n in range(max(len(reports), 1))
+    ]
+    fitting = [candidate for candidate in candidates if len(candidate) <= max_chars]
+    expected = fitting[-1] if fitting else None
+
     formatted = format_issue_body.truncate(
         reports, max_chars=max_chars, py_version=py_version
     )
 
-    assert formatted is None or len(formatted) <= max_chars
+    assert formatted == expected
+
+
+@given(
+    st.lists(preformatted_reports, max_size=20),
+    st.integers(min_value=0, max_value=2000),
+)
+def test_compressed_report(reports, max_chars):
+    py_version = ".".join(str(part) for part in sys.version_info[:3])
+
+    formatted = format_issue_body.compressed_report(
+        reports, max_chars=max_chars, py_version=py_version
+    )
+    summarized = format_issue_body.summarize(reports, py_version=py_version)
+
+    assert len(formatted) <= max_chars or formatted == summarized
 
 
-@given(st.lists(ansi_fe_escapes()).map("".join))
+@given(st.lists(ansi_fe_escapes).map("".join))
 def test_strip_ansi_multiple(escapes):
     assert format_issue_body.strip_ansi(escapes) == ""
 
 
-@given(ansi_fe_escapes())
+@given(ansi_fe_escapes)
 def test_strip_ansi(escape):
     message = f"some {escape}text"
 
     assert format_issue_body.strip_ansi(message) == "some text"
 
 
-@given(ansi_fe_escapes())
+@given(ansi_fe_escapes)
 def test_preformatted_report_ansi(escape):
     actual = format_issue_body.PreformattedReport(
         filepath="a", name="b", variant=None, message=f"{escape}text"
     )
     assert actual.message == "text"
+
+
+@given(st.text().filter(lambda s: "\x1b" not in s))
+def test_strip_ansi_no_escapes(message):
+    assert format_issue_body.strip_ansi(message) == message